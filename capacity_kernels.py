@@ -0,0 +1,367 @@
+
+import numpy as np
+
+# --- OPTIONAL JIT BACKEND ---
+# Numba is an optional dependency (see requirements.txt). Without it the kernels
+# below run as plain Python, so results are identical, just slower.
+try:
+    from numba import config, njit, prange
+    NUMBA_AVAILABLE = True
+    # Streamlit runs scripts on worker threads; OpenMP is thread-safe and, unlike TBB,
+    # doesn't hang interpreter shutdown when first launched off the main thread
+    config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+    prange = range
+
+# tsdownsample (Rust, SIMD) is optional too; the NumPy min/max buckets below are the fallback
+try:
+    from tsdownsample import MinMaxDownsampler
+    TSDOWNSAMPLE_AVAILABLE = True
+except ImportError:
+    TSDOWNSAMPLE_AVAILABLE = False
+
+# --- TOKEN BUCKET SIMULATION ---
+
+@njit(cache=True, fastmath=True)
+def simulate_buffer_loss(traffic_bits, capacity_bits_per_slot, max_buffer_bits, max_allowed_loss):
+    """
+    Drains a drop-tail buffer at a constant capacity and counts overflow slots.
+    Stops counting as soon as the loss allowance is exceeded.
+    """
+    current_buffer = 0.0
+    loss = 0
+
+    for i in range(traffic_bits.shape[0]):
+        current_buffer += traffic_bits[i]
+        if current_buffer > capacity_bits_per_slot:
+            current_buffer -= capacity_bits_per_slot
+        else:
+            current_buffer = 0.0
+        if current_buffer > max_buffer_bits:
+            loss += 1
+            current_buffer = max_buffer_bits
+            if loss > max_allowed_loss:
+                break
+
+    return loss
+
+# Warm up the JIT at import so the first dashboard render doesn't pay compile latency.
+# Traffic arrives as float32 bits-per-slot; the buffer itself always accumulates in float64.
+simulate_buffer_loss(np.zeros(8, dtype=np.float64), 1.0, 1.0, 0)
+simulate_buffer_loss(np.zeros(8, dtype=np.float32), 1.0, 1.0, 0)
+
+def traffic_prefix_sums(traffic_bits):
+    """
+    Capacity-independent part of the cumulative deficit, computed once per link:
+    D_k(c) = S_k - c * (k + 1) with S = cumsum(traffic_bits).
+    """
+    return np.cumsum(traffic_bits, dtype=np.float64), np.arange(1, traffic_bits.shape[0] + 1, dtype=np.float64)
+
+def buffer_loss_bounds(traffic_bits, capacity_bits_per_slot, max_buffer_bits, prefix_sums=None):
+    """
+    Closed-form (lower, upper) bounds on simulate_buffer_loss from the cumulative deficit.
+    Lower: slots whose own burst overflows an empty buffer.
+    Upper: overflow slots of the same queue without drop-tail, B_k = max_j(D_k - D_j).
+    Pass traffic_prefix_sums() to reuse the running sum across capacity candidates.
+    """
+    cumulative, slot_count = prefix_sums if prefix_sums is not None else traffic_prefix_sums(traffic_bits)
+    backlog = cumulative - capacity_bits_per_slot * slot_count
+    backlog += np.maximum(np.maximum.accumulate(-backlog), 0.0)
+
+    lower = int(np.count_nonzero(traffic_bits > capacity_bits_per_slot + max_buffer_bits))
+    upper = int(np.count_nonzero(backlog > max_buffer_bits))
+    return lower, upper
+
+def count_buffer_loss(traffic_bits, capacity_bits_per_slot, max_buffer_bits, max_allowed_loss, prefix_sums=None):
+    """
+    Loss count on the correct side of max_allowed_loss (exact only when the simulation runs).
+    Without the JIT, most binary-search candidates are decided by the closed-form bounds.
+    """
+    if not NUMBA_AVAILABLE:
+        lower, upper = buffer_loss_bounds(traffic_bits, capacity_bits_per_slot, max_buffer_bits, prefix_sums)
+        if upper <= max_allowed_loss:
+            return upper
+        if lower > max_allowed_loss:
+            return lower
+
+    return simulate_buffer_loss(traffic_bits, capacity_bits_per_slot, max_buffer_bits, max_allowed_loss)
+
+# --- BATCHED CAPACITY SEARCH ---
+
+def capacity_search_bounds(traffic_gbps, buffer_time_sec, slot_duration_sec, max_loss_pct):
+    """
+    Starting bracket (low, high), stopping tolerance and loss allowance (slots) of the
+    capacity search for one link.
+    """
+    low, high = np.mean(traffic_gbps), np.max(traffic_gbps)
+    max_allowed_loss_slots = int(len(traffic_gbps) * (max_loss_pct / 100.0))
+    
+    # Same final precision as the former fixed 15 iterations (< 0.1% error margin on typical ranges)
+    tolerance = (high - low) / 2 ** 15
+    
+    # Below C = x * slot / (slot + buffer) a burst x overflows even an empty buffer, so the
+    # (allowed + 1)-th largest burst alone rules out every lower capacity
+    largest = -np.partition(-traffic_gbps, max_allowed_loss_slots)[max_allowed_loss_slots]
+    low = max(low, largest * slot_duration_sec / (slot_duration_sec + buffer_time_sec))
+    return low, high, tolerance, max_allowed_loss_slots
+
+@njit(parallel=True, cache=True)
+def _search_link_capacities_jit(traffic_bits, offsets, lows, highs, tolerances, max_allowed_losses,
+                                buffer_time_sec, gbps_scale, slot_duration_sec):
+    n_links = offsets.shape[0] - 1
+    capacities = np.empty(n_links, dtype=np.float64)
+    
+    for l in prange(n_links):
+        series = traffic_bits[offsets[l]:offsets[l + 1]]
+        max_allowed_loss = max_allowed_losses[l]
+        low = lows[l]
+        high = highs[l]
+        best_c = high
+        
+        step = (high - low) / 64
+        while low + step < high:
+            c = low + step
+            loss = simulate_buffer_loss(series, c * gbps_scale * slot_duration_sec,
+                                        buffer_time_sec * (c * gbps_scale), max_allowed_loss)
+            if loss <= max_allowed_loss:
+                best_c = c
+                high = c
+                break
+            low = c
+            step *= 2
+        
+        while high - low > tolerances[l]:
+            c = (low + high) / 2
+            loss = simulate_buffer_loss(series, c * gbps_scale * slot_duration_sec,
+                                        buffer_time_sec * (c * gbps_scale), max_allowed_loss)
+            if loss <= max_allowed_loss:
+                best_c = c
+                high = c
+            else:
+                low = c
+        
+        capacities[l] = best_c
+    
+    return capacities
+
+if NUMBA_AVAILABLE:
+    for _dtype in (np.float32, np.float64):
+        _search_link_capacities_jit(np.zeros(8, dtype=_dtype), np.array([0, 8], dtype=np.int64), np.zeros(1),
+                                    np.ones(1), np.ones(1), np.zeros(1, dtype=np.int64), 1.0, 1.0, 1.0)
+
+def search_link_capacities(traffic_bits, offsets, lows, highs, tolerances, max_allowed_losses,
+                           buffer_time_sec, gbps_scale, slot_duration_sec):
+    """
+    Bracketed capacity search for every link: gallop up from lows[l] in steps doubling
+    from (highs[l] - lows[l]) / 64, then bisect to tolerances[l].
+    traffic_bits holds all link series (bits per slot, float32 or float64) back to back,
+    split by offsets.
+    With the JIT: one parallel lane per link. Without it, candidates are decided by the
+    closed-form loss bounds where possible (count_buffer_loss), on prefix sums built once per link.
+    """
+    if NUMBA_AVAILABLE:
+        return _search_link_capacities_jit(traffic_bits, offsets, lows, highs, tolerances, max_allowed_losses,
+                                           buffer_time_sec, gbps_scale, slot_duration_sec)
+    
+    capacities = np.empty(offsets.shape[0] - 1, dtype=np.float64)
+    for l in range(capacities.shape[0]):
+        series = traffic_bits[offsets[l]:offsets[l + 1]]
+        prefix_sums = traffic_prefix_sums(series)
+        max_allowed_loss = int(max_allowed_losses[l])
+        low, high = lows[l], highs[l]
+        best_c = high
+        
+        def meets_loss_target(c):
+            loss = count_buffer_loss(series, c * gbps_scale * slot_duration_sec,
+                                     buffer_time_sec * (c * gbps_scale), max_allowed_loss, prefix_sums)
+            return loss <= max_allowed_loss
+        
+        step = (high - low) / 64
+        while low + step < high:
+            if meets_loss_target(low + step):
+                best_c = high = low + step
+                break
+            low += step
+            step *= 2
+        
+        while high - low > tolerances[l]:
+            c = (low + high) / 2
+            if meets_loss_target(c):
+                best_c = high = c
+            else:
+                low = c
+        
+        capacities[l] = best_c
+    
+    return capacities
+
+def solve_link_capacities(link_series, buffer_time_sec, gbps_scale, slot_duration_sec, max_loss_pct):
+    """
+    Minimum capacity of every link (a list of Gbps series) that keeps slot loss within
+    max_loss_pct behind a buffer of buffer_time_sec: capacity_search_bounds brackets each
+    link, search_link_capacities searches them all in one call.
+    The app and link_capacity_estimation.py both solve through here, so they agree.
+    """
+    bounds = np.array([
+        capacity_search_bounds(series, buffer_time_sec, slot_duration_sec, max_loss_pct) for series in link_series
+    ], dtype=np.float64).reshape(-1, 4)
+    
+    # Every series back to back in bits per slot, scaled in float64 and stored as float32
+    # (half the bytes streamed per simulation; the buffer still accumulates in float64)
+    traffic_bits = np.concatenate([np.asarray(series, dtype=np.float64) for series in link_series]) * gbps_scale * slot_duration_sec
+    traffic_bits = traffic_bits.astype(np.float32)
+    offsets = np.concatenate([[0], np.cumsum([len(series) for series in link_series])]).astype(np.int64)
+    
+    return search_link_capacities(
+        traffic_bits, offsets, bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3].astype(np.int64),
+        buffer_time_sec, gbps_scale, slot_duration_sec
+    )
+
+# --- FUSED LINK STATISTICS ---
+
+@njit(cache=True, fastmath=False)
+def _fused_link_moments_jit(traffic, threshold):
+    peak = -np.inf
+    mean = 0.0
+    m2 = 0.0
+    exceeded = 0
+
+    for i in range(traffic.shape[0]):
+        x = traffic[i]
+        if x > peak:
+            peak = x
+        delta = x - mean
+        mean += delta / (i + 1)
+        m2 += delta * (x - mean)
+        if x > threshold:
+            exceeded += 1
+
+    std = np.sqrt(m2 / traffic.shape[0]) if traffic.shape[0] > 0 else 0.0
+    return peak, mean, std, exceeded
+
+# Link series are float32; compile both signatures up front
+if NUMBA_AVAILABLE:
+    _fused_link_moments_jit(np.zeros(8, dtype=np.float64), 0.0)
+    _fused_link_moments_jit(np.zeros(8, dtype=np.float32), 0.0)
+
+def fused_link_moments(traffic, threshold):
+    """
+    Peak, mean, std and slots above threshold of a link's series: one pass (Welford)
+    when the JIT is available, NumPy's vectorized reductions otherwise.
+    """
+    if NUMBA_AVAILABLE:
+        return _fused_link_moments_jit(traffic, threshold)
+    
+    return (traffic.max(), traffic.mean(dtype=np.float64), traffic.std(dtype=np.float64),
+            int(np.count_nonzero(traffic > threshold)))
+
+# --- TOPOLOGY SCORING ---
+
+@njit(parallel=True, cache=True)
+def _link_peak_bits_jit(matrix, has_data, link_of_cell, n_links):
+    n_cells, n_slots = matrix.shape
+    peaks = np.zeros(n_links, dtype=np.float64)
+    
+    for l in prange(n_links):
+        total = np.zeros(n_slots, dtype=np.float64)
+        active = np.zeros(n_slots, dtype=np.bool_)
+        for c in range(n_cells):
+            if link_of_cell[c] == l:
+                for t in range(n_slots):
+                    total[t] += matrix[c, t]
+                    active[t] |= has_data[c, t]
+        
+        peak = -np.inf
+        for t in range(n_slots):
+            if active[t] and total[t] > peak:
+                peak = total[t]
+        peaks[l] = peak if peak > -np.inf else 0.0
+    
+    return peaks
+
+if NUMBA_AVAILABLE:
+    _link_peak_bits_jit(np.zeros((2, 4)), np.ones((2, 4), dtype=np.bool_), np.zeros(2, dtype=np.int32), 1)
+
+def link_peak_bits(matrix, has_data, link_of_cell, n_links):
+    """
+    Peak per-slot bits of each link when cells (rows of a cells x slots matrix) are
+    summed onto links by link_of_cell (int32, -1 = unassigned). Only slots where
+    some member cell logged traffic count; links without any traffic peak at 0.
+    """
+    if NUMBA_AVAILABLE:
+        return _link_peak_bits_jit(matrix, has_data, link_of_cell, n_links)
+    
+    peaks = np.zeros(n_links, dtype=np.float64)
+    for l in range(n_links):
+        rows = link_of_cell == l
+        active = has_data[rows].any(axis=0)
+        if active.any():
+            peaks[l] = matrix[rows].sum(axis=0)[active].max()
+    return peaks
+
+# --- CONGESTION SCORING ---
+
+@njit(parallel=True, cache=True)
+def _congestion_ratios_jit(tx, rx, late):
+    n = tx.shape[0]
+    late_ratio = np.empty(n, dtype=np.float64)
+    loss_ratio = np.empty(n, dtype=np.float64)
+    score = np.empty(n, dtype=np.float64)
+    
+    for i in prange(n):
+        late_r = late[i] / (rx[i] if rx[i] != 0 else 1.0)
+        loss_r = (tx[i] - rx[i]) / (tx[i] if tx[i] != 0 else 1.0)
+        late_ratio[i] = late_r
+        loss_ratio[i] = loss_r
+        # Written as a comparison so NaN passes through, like Series.clip
+        score[i] = 0.6 * late_r + 0.3 * (0.0 if loss_r < 0 else loss_r)
+    
+    return late_ratio, loss_ratio, score
+
+if NUMBA_AVAILABLE:
+    _congestion_ratios_jit(np.zeros(4), np.zeros(4), np.zeros(4))
+
+def congestion_ratios(tx, rx, late):
+    """
+    Late-packet ratio, loss ratio and congestion score (0.6 * late + 0.3 * max(loss, 0))
+    from per-slot packet counters (float64 arrays), in one pass when the JIT is available.
+    Zero denominators count as 1.
+    """
+    if NUMBA_AVAILABLE:
+        return _congestion_ratios_jit(tx, rx, late)
+    
+    late_ratio = late / np.where(rx == 0, 1.0, rx)
+    loss_ratio = (tx - rx) / np.where(tx == 0, 1.0, tx)
+    score = 0.6 * late_ratio + 0.3 * np.where(loss_ratio < 0, 0.0, loss_ratio)
+    return late_ratio, loss_ratio, score
+
+# --- TIMELINE DOWNSAMPLING ---
+
+def timeline_indices(x, y, n_out):
+    """
+    Sorted positions of about n_out points that keep the shape of a long (x, y) series,
+    including every bucket's minimum and maximum, so short bursts survive.
+    Rust MinMax when tsdownsample is installed; otherwise the same buckets in NumPy.
+    """
+    n = y.shape[0]
+    if n <= n_out:
+        return np.arange(n)
+    if TSDOWNSAMPLE_AVAILABLE:
+        return MinMaxDownsampler().downsample(x, y, n_out=n_out)
+    
+    size = -(-n // (n_out // 2))
+    full = n // size
+    buckets = y[:full * size].reshape(full, size)
+    starts = np.arange(full) * size
+    picks = [starts + buckets.argmin(axis=1), starts + buckets.argmax(axis=1), [0, n - 1]]
+    if full * size < n:
+        tail = y[full * size:]
+        picks.append([full * size + tail.argmin(), full * size + tail.argmax()])
+    return np.unique(np.concatenate(picks))
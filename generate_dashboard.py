@@ -1,16 +1,84 @@
 
+import html
 import json
+import mmap
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import os
+import sys
+
+from capacity_kernels import timeline_indices
+
+# plotly-resampler is optional: with it, --interactive serves the dashboard and re-aggregates
+# the traffic traces at full resolution on zoom; without it the static HTML is written
+try:
+    from plotly_resampler import FigureResampler
+    PLOTLY_RESAMPLER_AVAILABLE = True
+except ImportError:
+    PLOTLY_RESAMPLER_AVAILABLE = False
 
 # Configuration
 DATA_DIR = "s:/fronthaul_ai/data"
 JSON_FILE = "s:/fronthaul_ai/results_final.json"
-CSV_FILE = os.path.join(DATA_DIR, "link_traffic_timeseries.csv")
+PARQUET_DIR = os.path.join(DATA_DIR, "link_traffic_timeseries.parquet")  # partitioned by link_id
+CSV_FILE = os.path.join(DATA_DIR, "link_traffic_timeseries.csv")  # written when pyarrow is missing
 OUTPUT_HTML = "s:/fronthaul_ai/ch2_dashboard.html"
+MAX_PLOT_POINTS = 3000  # per link; the CSV keeps full resolution
+
+DASHBOARD_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+</head>
+<body style="font-family: sans-serif; margin: 24px;">
+<h2>{title}</h2>
+<p>{explanation}</p>
+{figures}
+</body>
+</html>
+"""
+
+def _last_json_object(text, source):
+    """
+    Parses the last top-level JSON object in text. Each '{' is tried from the end backwards
+    with JSONDecoder.raw_decode, so braces inside string values don't count; a candidate
+    replaces the current object only if it encloses it, which ends at the outermost one.
+    """
+    decoder = json.JSONDecoder()
+    result, result_start = None, None
+    start = text.rfind('{')
+    while start != -1:
+        try:
+            obj, end = decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            pass  # Not an object start, e.g. a brace inside a string or stdout noise
+        else:
+            if result_start is None or end > result_start:
+                result, result_start = obj, start
+        start = text.rfind('{', 0, start)
+    
+    if result_start is None:
+        raise ValueError(f"No JSON object found in {source}")
+    return result
+
+def load_last_json_object(path):
+    """
+    Parses the last top-level JSON object in a file that may carry stdout noise around it.
+    UTF-8 files are scanned in a memory map, so the noise after the last '}' is never decoded;
+    UTF-16 ones (PowerShell '>' redirects, like results.json) are decoded whole.
+    Raises ValueError if the file holds no object.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"No JSON object found in {path} (empty file)")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:2] in (b'\xff\xfe', b'\xfe\xff'):
+                text = data[:].decode('utf-16')
+            else:
+                text = data[:data.rfind(b'}') + 1].decode('utf-8', errors='replace')
+    return _last_json_object(text, path)
 
 def load_data():
     # Load JSON results (parsing tricky due to stdout noise in file, so we re-run logic or clean file)
@@ -22,51 +90,77 @@ def load_data():
     # Let's try to parse the last valid JSON from the results file
     # The 'type' output showed noise at start.
     
-    with open(JSON_FILE, 'r') as f:
-        results = json.load(f)
+    results = load_last_json_object(JSON_FILE)
             
-    # Load CSV
-    df = pd.read_csv(CSV_FILE)
-    return results, df
+    return results, iter_link_series()
+
+def iter_link_series():
+    """
+    Yields (link, DataFrame of slot_idx/gbps) per link, in link order, rows in slot order
+    as the estimator wrote them.
+    From the estimator's Parquet dataset only one link partition is read (and held) at a
+    time; the CSV written without pyarrow is read whole and split.
+    """
+    if os.path.isdir(PARQUET_DIR):
+        links = sorted(name.split("=", 1)[1] for name in os.listdir(PARQUET_DIR) if name.startswith("link_id="))
+        for link in links:
+            yield link, pd.read_parquet(PARQUET_DIR, columns=['slot_idx', 'gbps'], filters=[('link_id', '=', link)])
+        return
+    
+    df = pd.read_csv(CSV_FILE, usecols=['link_id', 'slot_idx', 'gbps'])
+    # Row positions per link from one groupby pass, instead of a string mask per link
+    for link, positions in df.groupby('link_id', sort=False).indices.items():
+        yield link, df.iloc[positions]
 
-def create_dashboard():
-    results, df = load_data()
+def create_dashboard(interactive=False):
+    results, link_frames = load_data()
+    interactive = interactive and PLOTLY_RESAMPLER_AVAILABLE
     
-    # Initialize Dashboard
-    fig = make_subplots(
-        rows=4, cols=1,
-        subplot_titles=("Link Traffic Overview (Gbps per Slot)", "Peak vs P99 vs Buffer-Aware Capacity", "Optimization Impact"),
-        vertical_spacing=0.1,
-        specs=[[{"type": "xy"}], [{"type": "xy"}], [{"type": "table"}], [{"type": "domain"}]] # Adjust specs if needed
-    )
+    # Separate figures, each rendered into its own <div> of one page: smaller JSON per plot
+    # and plotly.js loaded once from the CDN instead of being inlined
+    has_results = bool(results) and "link_results" in results
     
     # SECTION 2: Slot-Level Traffic Graph (Time Series)
-    # Sampling for performance (plot every 10th point if huge)
-    # df is likely large (~1M points). Plotly handles ~100k well.
-    # Let's aggregate slightly for view or plot a slice.
+    # df is likely large (~1M points), so each link is downsampled for rendering with
+    # min/max buckets (bursts and the peak survive, unlike stride sampling) and drawn in WebGL
+    fig_ts = go.Figure()
+    if interactive:
+        # Keeps the raw series server-side and only ships the visible window's aggregate
+        fig_ts = FigureResampler(fig_ts, default_n_shown_samples=MAX_PLOT_POINTS)
     
     colors = {"Link_1": "purple", "Link_2": "blue", "Link_3": "cyan"}
     
-    for link in df['link_id'].unique():
-        link_df = df[df['link_id'] == link].sort_values('slot_idx')
-        # Limit points
-        if len(link_df) > 10000:
-            link_df = link_df.iloc[::10] 
-            
-        fig.add_trace(
-            go.Scatter(x=link_df['slot_idx'], y=link_df['gbps'], mode='lines', name=f"{link} Traffic", line=dict(width=1), opacity=0.7),
-            row=1, col=1
-        )
+    for link, link_df in link_frames:
+        # The estimator writes each link in slot order, so the sort only runs for foreign files
+        if not link_df['slot_idx'].is_monotonic_increasing:
+            link_df = link_df.sort_values('slot_idx', kind='stable')
+        trace = go.Scattergl(mode='lines', name=f"{link} Traffic", line=dict(width=1), opacity=0.7)
+        if interactive:
+            fig_ts.add_trace(trace, hf_x=link_df['slot_idx'].to_numpy(), hf_y=link_df['gbps'].to_numpy())
+        else:
+            # Limit points
+            keep = timeline_indices(link_df['slot_idx'].to_numpy(), link_df['gbps'].to_numpy(), MAX_PLOT_POINTS)
+            link_df = link_df.iloc[keep]
+            trace.update(x=link_df['slot_idx'], y=link_df['gbps'])
+            fig_ts.add_trace(trace)
         
         # Add Lines for Limits (P99, Peak) if available
-        if results and "link_results" in results:
+        if has_results:
             res = results["link_results"].get(link)
             if res:
-                fig.add_hline(y=res['required_99_percentile_gbps'], line_dash="dash", line_color="orange", annotation_text=f"{link} P99", row=1, col=1)
-                fig.add_hline(y=res['required_with_buffer_gbps'], line_dash="dot", line_color="green", annotation_text=f"{link} Buffer", row=1, col=1)
-
+                fig_ts.add_hline(y=res['required_99_percentile_gbps'], line_dash="dash", line_color="orange", annotation_text=f"{link} P99")
+                fig_ts.add_hline(y=res['required_with_buffer_gbps'], line_dash="dot", line_color="green", annotation_text=f"{link} Buffer")
+    
+    fig_ts.update_layout(title_text="Link Traffic Overview (Gbps per Slot)", height=500, template="plotly_white", showlegend=True)
+    
+    if interactive:
+        fig_ts.show_dash(mode='external')
+        return
+    
+    figures = [fig_ts]
+    
     # SECTION 3: Peak vs Percentile Comparison (Bar Chart)
-    if results and "link_results" in results:
+    if has_results:
         links = []
         peak_vals = []
         p99_vals = []
@@ -77,13 +171,17 @@ def create_dashboard():
             peak_vals.append(v['peak_gbps'])
             p99_vals.append(v['required_99_percentile_gbps'])
             buffer_vals.append(v['required_with_buffer_gbps'])
-            
-        fig.add_trace(go.Bar(name='Peak Provisioning', x=links, y=peak_vals, marker_color='red'), row=2, col=1)
-        fig.add_trace(go.Bar(name='P99 Provisioning', x=links, y=p99_vals, marker_color='orange'), row=2, col=1)
-        fig.add_trace(go.Bar(name='Buffer-Aware (Optimal)', x=links, y=buffer_vals, marker_color='green'), row=2, col=1)
+        
+        fig_bar = go.Figure([
+            go.Bar(name='Peak Provisioning', x=links, y=peak_vals, marker_color='red'),
+            go.Bar(name='P99 Provisioning', x=links, y=p99_vals, marker_color='orange'),
+            go.Bar(name='Buffer-Aware (Optimal)', x=links, y=buffer_vals, marker_color='green')
+        ])
+        fig_bar.update_layout(title_text="Peak vs P99 vs Buffer-Aware Capacity", height=400, template="plotly_white")
+        figures.append(fig_bar)
 
     # SECTION 1: Summary Table
-    if results and "link_results" in results:
+    if has_results:
         header = ["Link", "Avg Gbps", "Peak Gbps", "P99 Gbps", "Buffer Gbps", "Overprovision Avoided %"]
         cells = []
         for k, v in results["link_results"].items():
@@ -95,28 +193,29 @@ def create_dashboard():
         # Transpose for plotly table
         cell_data = list(map(list, zip(*cells)))
         
-        fig.add_trace(
+        fig_table = go.Figure(
             go.Table(
                 header=dict(values=header, fill_color='paleturquoise', align='left'),
                 cells=dict(values=cell_data, fill_color='lavender', align='left')
-            ),
-            row=3, col=1
+            )
         )
-
-    # Layout Updates
-    fig.update_layout(
-        title_text="<b>Nokia Fronthaul Link Capacity Optimization - Challenge 2</b>",
-        height=1200,
-        template="plotly_white",
-        showlegend=True
-    )
+        fig_table.update_layout(title_text="Optimization Impact", height=300, template="plotly_white")
+        figures.append(fig_table)
     
     # Explanation
     explanation = results.get("telecom_explanation", "Analysis complete.") if results else ""
     
-    # Save
-    fig.write_html(OUTPUT_HTML)
+    # Save (plotly.js is included with the first figure only)
+    divs = [fig.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False) for i, fig in enumerate(figures)]
+    with open(OUTPUT_HTML, 'w', encoding='utf-8') as f:
+        f.write(DASHBOARD_TEMPLATE.format(
+            title="Nokia Fronthaul Link Capacity Optimization - Challenge 2",
+            explanation=html.escape(explanation),
+            figures="\n".join(divs)
+        ))
     print(f"Dashboard saved to {OUTPUT_HTML}")
 
 if __name__ == "__main__":
-    create_dashboard()
+    if "--interactive" in sys.argv and not PLOTLY_RESAMPLER_AVAILABLE:
+        print("plotly-resampler is not installed; writing the static dashboard instead.")
+    create_dashboard(interactive="--interactive" in sys.argv)
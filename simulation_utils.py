@@ -1,222 +1,247 @@
 
+import time
 import streamlit as st
 import matplotlib.pyplot as plt
 import networkx as nx
 import pandas as pd
 import numpy as np
-import time
 import plotly.graph_objects as go
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
 
 # --- 3D VISUALIZATION (from threed_graph.py) ---
 
-def generate_3d_topology(link_mapping, active_congestion=None, active_link_status=None):
+def link_mapping_key(link_mapping):
+    """Hashable signature of a Link ID -> cells mapping (cell order kept: it drives the layout)."""
+    return tuple((link_id, tuple(link_mapping[link_id])) for link_id in sorted(link_mapping.keys()))
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _topology_layout(mapping_key):
     """
-    Generates a 3D aesthetic topology figure using Plotly.
-    link_mapping: Dict[str, List[int]] (Link ID -> List of Cell IDs)
-    active_congestion: Dict[int, int] (Cell ID -> Congestion Level 0,1,2)
-    active_link_status: Dict[str, int] (Link ID -> Congestion Level 0,1,2) - Optional override for CSRs
+    The congestion-independent part of generate_3d_topology, cached per mapping signature:
+    the DU -> Leaf Switch -> CSR -> RU -> Cell tree, its 3D positions and the per-node index
+    arrays the congestion roll-up and traces are built from. Returns a dict of plain lists
+    and arrays; nodes are numbered in insertion order (row i of xyz).
+    Each cell is expected to appear once in the mapping (it is a cell -> link partition).
     """
-    G = nx.Graph()
+    link_mapping = dict(mapping_key)
+    nodes, types, labels = [], [], []
+    node_index = {}
+    
+    def add_node(node, node_type, label):
+        node_index[node] = len(nodes)
+        nodes.append(node)
+        types.append(node_type)
+        labels.append(label)
+        return node_index[node]
     
     # 1. Define Fixed Hierarchy Nodes (Standard Fronthaul Architecture)
-    G.add_node("DU", type="core", group="Core", label="Distributed Unit (DU)")
-    G.add_node("Leaf_Switch", type="switch", group="Core", label="Leaf Switch")
-    G.add_edge("DU", "Leaf_Switch")
+    du = add_node("DU", "core", "Distributed Unit (DU)")
+    leaf = add_node("Leaf_Switch", "switch", "Leaf Switch")
     
     # 2. Create CSR nodes for EACH link in link_mapping (Link_1, Link_2, Link_3)
-    link_ids = sorted(link_mapping.keys())  # e.g. ['Link_1', 'Link_2', 'Link_3']
-    
-    for link_id in link_ids:
-        csr_id = f"CSR_{link_id}"
-        G.add_node(csr_id, type="csr", group=link_id, label=f"CSR ({link_id})")
-        G.add_edge("Leaf_Switch", csr_id)
-    
-    # Calculate Node Congestion States (Bottom-Up Propagation)
-    node_congestion = {}  # node_id -> level (0,1,2)
+    link_ids = [link_id for link_id, _ in mapping_key]  # e.g. ['Link_1', 'Link_2', 'Link_3']
+    csr_rows = [add_node(f"CSR_{link_id}", "csr", f"CSR ({link_id})") for link_id in link_ids]
     
     # 3. Add RUs and Cells per Link
+    # Flat per-layer lists: cells in link order (RUs take consecutive runs of 4), RUs in link
+    # order; ru_starts / link_ru_counts segment them for the bottom-up reductions
+    cells, cell_rows, cell_parents, cell_k, cell_n = [], [], [], [], []
+    ru_rows, ru_starts, link_ru_counts = [], [], []
+    csr_ru_edges, ru_cell_edges = [], []
+    report_rows = []  # node rows in the order the congestion report lists them
     ru_counter = 1
-    for link_id in link_ids:
-        cells = link_mapping[link_id]
-        csr_id = f"CSR_{link_id}"
-        
-        # Init Cells congestion
-        for cell in cells:
-            lvl = 0
-            if active_congestion:
-                lvl = active_congestion.get(cell, 0)
-            node_congestion[f"Cell_{cell}"] = lvl
+    for link_id, csr in zip(link_ids, csr_rows):
+        link_cells = list(link_mapping[link_id])
         
         # Group cells into RUs (4 cells per RU)
-        cell_chunks = [cells[i:i + 4] for i in range(0, len(cells), 4)]
+        cell_chunks = [link_cells[i:i + 4] for i in range(0, len(link_cells), 4)]
+        link_ru_counts.append(len(cell_chunks))
+        link_report = []
         
         for cells_in_ru in cell_chunks:
-            ru_id = f"RU_{ru_counter}"
+            ru = add_node(f"RU_{ru_counter}", "ru", f"Radio Unit {ru_counter}")
             ru_counter += 1
+            ru_rows.append(ru)
+            ru_starts.append(len(cells))
+            csr_ru_edges.append((csr, ru))
             
-            G.add_node(ru_id, type="ru", group=link_id, label=f"Radio Unit {ru_counter-1}")
-            G.add_edge(csr_id, ru_id)
-            
-            ru_max = 0
-            for cell in cells_in_ru:
-                cell_node = f"Cell_{cell}"
-                G.add_node(cell_node, type="cell", group=link_id, label=f"Cell {cell}")
-                G.add_edge(ru_id, cell_node)
-                ru_max = max(ru_max, node_congestion.get(cell_node, 0))
-            
-            node_congestion[ru_id] = ru_max
+            for k, cell in enumerate(cells_in_ru):
+                row = add_node(f"Cell_{cell}", "cell", f"Cell {cell}")
+                cells.append(cell)
+                cell_rows.append(row)
+                cell_parents.append(ru)
+                cell_k.append(k)
+                cell_n.append(len(cells_in_ru))
+                ru_cell_edges.append((ru, row))
+            link_report.append(ru)
         
-        # CSR Congestion Logic:
-        # If we have calculated Link Status (from App aggregation), use that.
-        # Otherwise, fallback to Max Propagation from RUs.
-        if active_link_status and link_id in active_link_status:
-            node_congestion[csr_id] = active_link_status[link_id]
-        else:
-            csr_max = 0
-            for neighbor in G.neighbors(csr_id):
-                if G.nodes[neighbor]["type"] == "ru":
-                    csr_max = max(csr_max, node_congestion.get(neighbor, 0))
-            node_congestion[csr_id] = csr_max
+        report_rows.extend(cell_rows[len(cell_rows) - len(link_cells):] + link_report + [csr])
+    report_rows.extend([leaf, du])
+    
+    # Edge order as a graph traversal lists them: core, Leaf Switch -> CSRs, CSRs -> RUs, RUs -> Cells
+    edges = [(du, leaf)] + [(leaf, csr) for csr in csr_rows] + csr_ru_edges + ru_cell_edges
+    edges = np.array(edges, dtype=np.int32).reshape(-1, 2)
     
-    # Propagate to Leaf Switch and DU
-    sw_max = max([node_congestion.get(f"CSR_{l}", 0) for l in link_ids], default=0)
-    node_congestion["Leaf_Switch"] = sw_max
-    node_congestion["DU"] = sw_max
-
-
     # 4. Compute 3D Layout (Structured Radial Hierarchical)
-    pos = {}
+    # One cos/sin call per layer over all of its angles, written straight into xyz
+    # (float32: ample for plot coordinates, and half the bytes in every trace sent to the browser)
+    xyz = np.zeros((len(nodes), 3), dtype=np.float32)
     
     # A) Core Layer (Top)
-    pos["DU"] = np.array([0, 0, 3.0])
-    pos["Leaf_Switch"] = np.array([0, 0, 2.5])
+    xyz[du] = (0, 0, 3.0)
+    xyz[leaf] = (0, 0, 2.5)
     
     # B) Link Distribution (CSRs)
     # Distribute links in a perfect circle
     num_links = len(link_ids)
     radius_csr = 1.5
+    # Phase shift to make Link 1 start at 12 o'clock if possible, or simple division
+    thetas = (2 * np.pi * np.arange(num_links)) / num_links
+    xyz[csr_rows, 0] = radius_csr * np.cos(thetas)
+    xyz[csr_rows, 1] = radius_csr * np.sin(thetas)
+    xyz[csr_rows, 2] = 2.0
     
-    for i, link_id in enumerate(link_ids):
-        # Calculate angle for this link branch
-        # Phase shift to make Link 1 start at 12 o'clock if possible, or simple division
-        theta = (2 * np.pi * i) / num_links
-        
-        csr_x = radius_csr * np.cos(theta)
-        csr_y = radius_csr * np.sin(theta)
-        csr_z = 2.0
-        
-        csr_node = f"CSR_{link_id}"
-        pos[csr_node] = np.array([csr_x, csr_y, csr_z])
-        
-        # C) RU Distribution (Middle Layer)
-        # Find RUs strictly belonging to this CSR group
-        rus = [n for n in G.neighbors(csr_node) if G.nodes[n].get("type") == "ru"]
-        num_rus = len(rus)
-        
+    # C) RU Distribution (Middle Layer)
+    # Place RUs in an arc centered on the CSR's angle
+    # We constrain the arc so branches don't overlap
+    max_arc_width = np.pi / 2 if num_links <= 2 else (2 * np.pi / num_links) * 0.7
+    radius_ru = 3.0  # wider radius for RUs
+    ru_thetas = []
+    for theta, num_rus in zip(thetas, link_ru_counts):
         if num_rus > 0:
-            # Place RUs in an arc centered on the CSR's angle
-            # We constrain the arc so branches don't overlap
-            max_arc_width = np.pi / 2 if num_links <= 2 else (2 * np.pi / num_links) * 0.7
-            
-            radius_ru = 3.0  # wider radius for RUs
-            
-            for j, ru in enumerate(rus):
-                # Calculate relative angle offset within the branch sector
-                if num_rus == 1:
-                    angle_offset = 0
-                else:
-                    # Linspace between -arc/2 and +arc/2
-                    angle_offset = np.linspace(-max_arc_width/2, max_arc_width/2, num_rus)[j]
-                
-                ru_theta = theta + angle_offset
-                ru_x = radius_ru * np.cos(ru_theta)
-                ru_y = radius_ru * np.sin(ru_theta)
-                ru_z = 1.0
-                pos[ru] = np.array([ru_x, ru_y, ru_z])
-                
-                # D) Cell Distribution (Bottom Layer)
-                cells = [n for n in G.neighbors(ru) if G.nodes[n].get("type") == "cell"]
-                num_cells = len(cells)
-                
-                if num_cells > 0:
-                    radius_cell_local = 0.4  # Tight cluster around RU
-                    for k, cell in enumerate(cells):
-                        # Circle around the RU position
-                        cell_theta_local = (2 * np.pi * k) / num_cells
-                        cell_x = ru_x + radius_cell_local * np.cos(cell_theta_local)
-                        cell_y = ru_y + radius_cell_local * np.sin(cell_theta_local)
-                        cell_z = 0.0
-                        pos[cell] = np.array([cell_x, cell_y, cell_z])
+            # Linspace between -arc/2 and +arc/2 (a lone RU sits on the CSR's angle)
+            angle_offsets = np.linspace(-max_arc_width/2, max_arc_width/2, num_rus) if num_rus > 1 else np.zeros(1)
+            ru_thetas.append(theta + angle_offsets)
+    ru_thetas = np.concatenate(ru_thetas) if ru_thetas else np.empty(0)
+    xyz[ru_rows, 0] = radius_ru * np.cos(ru_thetas)
+    xyz[ru_rows, 1] = radius_ru * np.sin(ru_thetas)
+    xyz[ru_rows, 2] = 1.0
+    
+    # D) Cell Distribution (Bottom Layer)
+    # Circle around the RU position: the k-th of an RU's n cells at angle 2*pi*k/n
+    radius_cell_local = 0.4  # Tight cluster around RU
+    cell_thetas = (2 * np.pi * np.array(cell_k, dtype=np.float64)) / np.array(cell_n, dtype=np.float64)
+    cell_parents = np.array(cell_parents, dtype=np.int64)
+    xyz[cell_rows, 0] = xyz[cell_parents, 0] + radius_cell_local * np.cos(cell_thetas)
+    xyz[cell_rows, 1] = xyz[cell_parents, 1] + radius_cell_local * np.sin(cell_thetas)
+    xyz[cell_rows, 2] = 0.0
+    
+    return {
+        'nodes': nodes,
+        'labels': labels,
+        'xyz': xyz,
+        'edges': edges,
+        'by_type': {t: np.flatnonzero(np.array(types) == t) for t in dict.fromkeys(types)},
+        'link_ids': link_ids,
+        'csr_rows': np.array(csr_rows, dtype=np.int64),
+        'link_ru_counts': np.array(link_ru_counts, dtype=np.int64),
+        'ru_rows': np.array(ru_rows, dtype=np.int64),
+        'ru_starts': np.array(ru_starts, dtype=np.int64),
+        'cells': cells,
+        'cell_rows': np.array(cell_rows, dtype=np.int64),
+        'report_rows': report_rows,
+        'switch_rows': [leaf, du],
+    }
+
+def generate_3d_topology(link_mapping, active_congestion=None, active_link_status=None):
+    """
+    Generates a 3D aesthetic topology figure using Plotly.
+    link_mapping: Dict[str, List[int]] (Link ID -> List of Cell IDs)
+    active_congestion: Dict[int, int] (Cell ID -> Congestion Level 0,1,2)
+    active_link_status: Dict[str, int] (Link ID -> Congestion Level 0,1,2) - Optional override for CSRs
+    The layout comes from _topology_layout (cached per mapping); only the congestion
+    roll-up and the traces are rebuilt for each congestion state.
+    """
+    layout = _topology_layout(link_mapping_key(link_mapping))
+    nodes, xyz, edges = layout['nodes'], layout['xyz'], layout['edges']
+    
+    # Calculate Node Congestion States (Bottom-Up Propagation), dense int8 level per node row
+    node_level = np.zeros(len(nodes), dtype=np.int8)
+    
+    # Init Cells congestion
+    if active_congestion:
+        cell_level = np.array([active_congestion.get(cell, 0) for cell in layout['cells']], dtype=np.int8)
+    else:
+        cell_level = np.zeros(len(layout['cells']), dtype=np.int8)
+    node_level[layout['cell_rows']] = cell_level
+    
+    # RU: max of its cells (every RU has at least one)
+    ru_level = np.maximum.reduceat(cell_level, layout['ru_starts']) if len(layout['ru_starts']) else cell_level[:0]
+    node_level[layout['ru_rows']] = ru_level
+    
+    # CSR Congestion Logic:
+    # If we have calculated Link Status (from App aggregation), use that.
+    # Otherwise, fallback to Max Propagation from RUs.
+    counts = layout['link_ru_counts']
+    csr_level = np.zeros(len(counts), dtype=np.int8)
+    has_rus = counts > 0
+    if has_rus.any():
+        csr_level[has_rus] = np.maximum.reduceat(ru_level, (np.cumsum(counts) - counts)[has_rus])
+    if active_link_status:
+        for i, link_id in enumerate(layout['link_ids']):
+            if link_id in active_link_status:
+                csr_level[i] = active_link_status[link_id]
+    node_level[layout['csr_rows']] = csr_level
+    
+    # Propagate to Leaf Switch and DU
+    node_level[layout['switch_rows']] = csr_level.max(initial=0)
     
     # 5. Create Traces by Group (For Legend & Styling)
     traces = []
     
-    # --- EDGE COLORING HELPER ---
-    def get_edge_level(u, v):
-        # Edge level is the max congestion of its endpoints
-        # Usually dominated by the downstream node in a tree
-        return max(node_congestion.get(u,0), node_congestion.get(v,0))
+    # Edge level is the max congestion of its endpoints
+    # Usually dominated by the downstream node in a tree
+    edge_level = np.maximum(node_level[edges[:, 0]], node_level[edges[:, 1]])
 
     # --- EDGES (Split by Congestion Level) ---
-    for level, color, name, width in [
+    # --- DATA FLOW SIMULATION (Congestion Aware) ---
+    # One pass per level gathers its edges' endpoints once for both the line trace and the
+    # flow markers; flow traces still follow all edge traces in the legend
+    edge_styles = [
         (0, '#444444', 'Healthy Links', 3),
         (1, '#ff7f0e', 'Warning Links', 5),
         (2, '#ff0000', 'Congested Links (Critical)', 8)
-    ]:
-        edge_x, edge_y, edge_z = [], [], []
-        found = False
-        for edge in G.edges():
-            lvl = get_edge_level(edge[0], edge[1])
-            if lvl == level:
-                found = True
-                x0, y0, z0 = pos[edge[0]]
-                x1, y1, z1 = pos[edge[1]]
-                edge_x.extend([x0, x1, None])
-                edge_y.extend([y0, y1, None])
-                edge_z.extend([z0, z1, None])
+    ]
+    flow_styles = [
+        ('#00f3ff', 'Flow (Normal)', 3),
+        ('#ffaa00', 'Flow (High Load)', 5),
+        ('#ffffff', 'Flow (DROPPED)', 6) # White flashes for drops
+    ]
+    # Interpolate points: 4 inner points (ratios 1/5 .. 4/5) along every edge
+    steps = 5
+    ratios = (np.arange(1, steps, dtype=np.float32) / steps)[None, :, None]
+    flow_traces = []
+    for (level, color, name, width), (flow_color, flow_name, size) in zip(edge_styles, flow_styles):
+        selected = edges[edge_level == level]
+        if not len(selected):
+            continue
+        ends = xyz[selected]  # (edges, 2, 3): x0/y0/z0 and x1/y1/z1
         
-        if found:
-            traces.append(go.Scatter3d(
-                x=edge_x, y=edge_y, z=edge_z,
-                mode='lines',
-                name=name,
-                line=dict(color=color, width=width),
-                opacity=0.7 if level==0 else 1.0,
-                hoverinfo='none',
-                showlegend=True
-            ))
-
-    # --- DATA FLOW SIMULATION (Congestion Aware) ---
-    for level, color, name, size in [
-        (0, '#00f3ff', 'Flow (Normal)', 3),
-        (1, '#ffaa00', 'Flow (High Load)', 5),
-        (2, '#ffffff', 'Flow (DROPPED)', 6) # White flashes for drops
-    ]:
-        flow_x, flow_y, flow_z = [], [], []
-        found = False
-        for edge in G.edges():
-            lvl = get_edge_level(edge[0], edge[1])
-            if lvl == level:
-                found = True
-                x0, y0, z0 = pos[edge[0]]
-                x1, y1, z1 = pos[edge[1]]
-                # Interpolate points
-                steps = 5
-                for s in range(1, steps):
-                    ratio = s / steps
-                    flow_x.append(x0 + (x1-x0)*ratio)
-                    flow_y.append(y0 + (y1-y0)*ratio)
-                    flow_z.append(z0 + (z1-z0)*ratio)
+        # A NaN row (serialized as null) breaks the line between edges: rows x0, x1, NaN
+        gaps = np.full((len(selected), 1, 3), np.nan, dtype=np.float32)
+        segments = np.concatenate([ends, gaps], axis=1).reshape(-1, 3).T.copy()
+        traces.append(go.Scatter3d(
+            x=segments[0], y=segments[1], z=segments[2],
+            mode='lines',
+            name=name,
+            line=dict(color=color, width=width),
+            opacity=0.7 if level==0 else 1.0,
+            hoverinfo='none',
+            showlegend=True
+        ))
         
-        if found:
-            traces.append(go.Scatter3d(
-                x=flow_x, y=flow_y, z=flow_z,
-                mode='markers',
-                name=name,
-                marker=dict(size=size, color=color, opacity=0.8),
-                hoverinfo='none',
-                showlegend=True
-            ))
+        start, end = ends[:, :1], ends[:, 1:]
+        flow = (start + (end - start) * ratios).reshape(-1, 3).T.copy()
+        flow_traces.append(go.Scatter3d(
+            x=flow[0], y=flow[1], z=flow[2],
+            mode='markers',
+            name=flow_name,
+            marker=dict(size=size, color=flow_color, opacity=0.8),
+            hoverinfo='none',
+            showlegend=True
+        ))
+    traces.extend(flow_traces)
 
     # --- NODES (Categorized) ---
     # Define categories properties
@@ -228,28 +253,19 @@ def generate_3d_topology(link_mapping, active_congestion=None, active_link_statu
         "cell":   {"color": "#bdc3c7", "size": 8,  "symbol": "circle", "name": "Cell Site"}
     }
     
-    # Bucket nodes
-    node_groups = {k: {"x": [], "y": [], "z": [], "text": []} for k in categories}
-    
-    for node in G.nodes():
-        params = node_groups[G.nodes[node]["type"]]
-        x, y, z = pos[node]
-        params["x"].append(x)
-        params["y"].append(y)
-        params["z"].append(z)
-        params["text"].append(G.nodes[node].get("label", node))
-
     # Create a trace for each category
-    for cat_type, data in node_groups.items():
-        if not data["x"]: continue
-        
-        style = categories[cat_type]
+    # (coordinates and labels as arrays: Plotly validates an ndarray as a whole, not per element)
+    labels = np.array(layout['labels'], dtype=object)
+    for cat_type, style in categories.items():
+        rows = layout['by_type'].get(cat_type)
+        if rows is None or not len(rows): continue
+        coords = xyz[rows].T.copy()
         
         # Show text labels for non-cell nodes to reduce clutter
         mode = 'markers+text' if cat_type != 'cell' else 'markers'
         
         traces.append(go.Scatter3d(
-            x=data["x"], y=data["y"], z=data["z"],
+            x=coords[0], y=coords[1], z=coords[2],
             mode=mode,
             name=style["name"],
             marker=dict(
@@ -259,7 +275,7 @@ def generate_3d_topology(link_mapping, active_congestion=None, active_link_statu
                 line=dict(color='#ffffff', width=2),
                 opacity=1.0
             ),
-            text=data["text"],
+            text=labels[rows],
             textposition="top center",
             textfont=dict(color="#ffffff", size=10) if cat_type != 'cell' else None,
             hoverinfo='text'
@@ -294,10 +310,10 @@ def generate_3d_topology(link_mapping, active_congestion=None, active_link_statu
     )
     # Identify Congested Elements for Report
     congested_elements = []
-    for node, level in node_congestion.items():
+    report_levels = node_level[layout['report_rows']].tolist()
+    for row, level in zip(layout['report_rows'], report_levels):
         if level > 0:
-            label = G.nodes[node].get("label", node)
-            congested_elements.append({"node": label, "level": level})
+            congested_elements.append({"node": layout['labels'][row], "level": level})
             
     return fig, congested_elements
 
@@ -315,59 +331,102 @@ SIZE_MAP = {
     2: 600
 }
 
-def draw_network_frame(G, pos, active_congestion, current_slot, ax=None):
-    if ax is None:
-        fig, ax = plt.subplots(figsize=(10, 8))
-    else:
-        fig = ax.figure
+# RGBA rows by level, so animation frames hand matplotlib ready float arrays (no color parsing)
+NODE_RGBA = to_rgba_array([COLOR_MAP[level] for level in range(3)])
+LINK_NODE_RGBA = to_rgba_array("#7f7f7f")[0]
+EDGE_RGBA = to_rgba_array(["#cccccc", "#ff7f0e", "#d62728"])
 
-    ax.clear()
+def _parse_cell_id(node):
+    try:
+        return int(str(node).replace("Cell_", ""))
+    except:
+        return None
+
+def graph_cell_ids(G):
+    """
+    Cell ID of every node and of every edge's cell end ("Cell_X" names, -1 for anything
+    else) as int64 arrays aligned with G.nodes() / G.edges(), plus the "link" node mask.
+    Parsed once per graph and kept in G.graph, so frame styling does no string work.
+    """
+    if len(G.graph.get('cell_id_arr', ())) != G.number_of_nodes() or \
+            len(G.graph.get('edge_cell_arr', ())) != G.number_of_edges():
+        node_cells = [_parse_cell_id(node) for node in G.nodes()]
+        edge_cells = [_parse_cell_id(u if "Cell_" in str(u) else v) for u, v in G.edges()]
+        G.graph['cell_id_arr'] = np.array([-1 if c is None else c for c in node_cells], dtype=np.int64)
+        G.graph['edge_cell_arr'] = np.array([-1 if c is None else c for c in edge_cells], dtype=np.int64)
+        G.graph['link_node_mask'] = np.array(
+            [G.nodes[node].get("type", "cell") == "link" for node in G.nodes()], dtype=bool
+        )
+    return G.graph['cell_id_arr'], G.graph['edge_cell_arr'], G.graph['link_node_mask']
+
+def _cell_columns(node_cells, edge_cells):
+    """Sorted distinct cell IDs and each node's / edge's column in them (len(cells) for none)."""
+    cells = np.unique(np.concatenate([node_cells, edge_cells]))
+    cells = cells[cells >= 0]
+    def column(ids):
+        return np.where(ids >= 0, np.searchsorted(cells, ids), len(cells))
+    return cells, column(node_cells), column(edge_cells)
+
+def network_frame_styles(G, active_congestion):
+    """Node colors/sizes and edge colors/widths for one congestion state."""
+    node_cells, edge_cells, node_is_link = graph_cell_ids(G)
+    cells, node_cols, edge_cols = _cell_columns(node_cells, edge_cells)
     
-    node_colors = []
-    node_sizes = []
+    # One dict lookup per distinct cell; the trailing 0 is "not a cell"
+    levels = np.array([active_congestion.get(c, 0) for c in cells.tolist()] + [0], dtype=np.float64)
+    # Unknown levels fall back to the healthy style, as COLOR_MAP.get/SIZE_MAP.get do
+    levels = np.where(np.isin(levels, list(COLOR_MAP)), levels, 0).astype(np.int64)
+    node_levels = levels[node_cols]
+    edge_levels = levels[edge_cols]
     
-    for node in G.nodes():
-        node_type = G.nodes[node].get("type", "cell")
-        
-        if node_type == "link":
-            node_colors.append("#7f7f7f")
-            node_sizes.append(400)
-            continue
-            
-        # Extract Cell ID from "Cell_X"
-        try:
-            cell_id = int(str(node).replace("Cell_", ""))
-            level = active_congestion.get(cell_id, 0)
-        except:
-            level = 0
-            
-        node_colors.append(COLOR_MAP.get(level, "#2ca02c"))
-        node_sizes.append(SIZE_MAP.get(level, 300))
+    node_colors = np.array([COLOR_MAP[level] for level in range(3)], dtype=object)[node_levels]
+    node_sizes = np.array([SIZE_MAP[level] for level in range(3)])[node_levels]
+    node_colors[node_is_link] = "#7f7f7f"
+    node_sizes[node_is_link] = 400
+    
+    # Edges color based on the cell node
+    edge_colors = np.array(["#cccccc", "#ff7f0e", "#d62728"], dtype=object)[edge_levels]
+    edge_widths = np.array([1.0, 2.0, 3.0])[edge_levels]
+    
+    return node_colors.tolist(), node_sizes.tolist(), edge_colors.tolist(), edge_widths.tolist()
 
-    edge_colors = []
-    edge_widths = []
-    
-    for u, v in G.edges():
-        # Simplification: Edges color based on the cell node
-        # Assume u or v is the cell
-        cell_node = u if "Cell_" in str(u) else v
-        try:
-            cell_id = int(str(cell_node).replace("Cell_", ""))
-            level = active_congestion.get(cell_id, 0)
-        except:
-            level = 0
-            
-        if level == 2:
-            edge_colors.append("#d62728")
-            edge_widths.append(3.0)
-        elif level == 1:
-            edge_colors.append("#ff7f0e")
-            edge_widths.append(2.0)
-        else:
-            edge_colors.append("#cccccc") 
-            edge_widths.append(1.0)
+def precompute_frame_styles(G, congestion_state, slots):
+    """
+    network_frame_styles for every slot in `slots` at once, as (frames, nodes) and
+    (frames, edges) arrays built from one reindexed level matrix. Colors are RGBA
+    (frames, n, 4) float arrays, so a frame's styles go to the artists unconverted.
+    """
+    slots = list(slots)
+    node_cells, edge_cells, node_is_link = graph_cell_ids(G)
+    cells, node_cols, edge_cols = _cell_columns(node_cells, edge_cells)
+    
+    # Level matrix (frames, cells) plus a trailing all-zero column for "no cell / missing slot"
+    levels = congestion_state.reindex(index=slots, columns=cells, fill_value=0).to_numpy()
+    levels = np.hstack([levels, np.zeros((len(slots), 1), dtype=levels.dtype)])
+    
+    node_levels = levels[:, node_cols]
+    edge_levels = levels[:, edge_cols]
+    
+    # Unknown levels fall back to the healthy style, as COLOR_MAP.get/SIZE_MAP.get do
+    node_levels = np.where(np.isin(node_levels, list(COLOR_MAP)), node_levels, 0)
+    node_colors = NODE_RGBA[node_levels]
+    node_sizes = np.array([SIZE_MAP[level] for level in range(3)])[node_levels]
+    node_colors[:, node_is_link] = LINK_NODE_RGBA
+    node_sizes[:, node_is_link] = 400
+    
+    # Levels other than 1 and 2 draw as the healthy edge
+    edge_levels = np.where(np.isin(edge_levels, (1, 2)), edge_levels, 0)
+    edge_colors = EDGE_RGBA[edge_levels]
+    edge_widths = np.array([1.0, 2.0, 3.0])[edge_levels]
+    
+    return node_colors, node_sizes, edge_colors, edge_widths
 
-    nx.draw_networkx_nodes(
+def _draw_network(G, pos, styles, current_slot, ax):
+    """Draws the full frame and returns the (nodes, edges) artists for in-place updates."""
+    node_colors, node_sizes, edge_colors, edge_widths = styles
+    ax.clear()
+
+    nodes = nx.draw_networkx_nodes(
         G, pos, 
         node_size=node_sizes, 
         node_color=node_colors, 
@@ -376,7 +435,7 @@ def draw_network_frame(G, pos, active_congestion, current_slot, ax=None):
         ax=ax
     )
     
-    nx.draw_networkx_edges(
+    edges = nx.draw_networkx_edges(
         G, pos, 
         edge_color=edge_colors, 
         width=edge_widths,
@@ -395,6 +454,34 @@ def draw_network_frame(G, pos, active_congestion, current_slot, ax=None):
     ax.set_title(f"Simulation Time: Slot {current_slot}", fontsize=14, loc='left')
     ax.axis('off')
     
+    return nodes, edges
+
+def update_network_frame(artists, styles, current_slot, ax):
+    """
+    Restyles an already drawn frame in place (colors, sizes, widths, title).
+    Returns False if the edges aren't a single LineCollection (directed graphs draw
+    one arrow patch per edge), in which case the caller redraws the frame.
+    """
+    nodes, edges = artists
+    node_colors, node_sizes, edge_colors, edge_widths = styles
+    if not isinstance(edges, LineCollection):
+        return False
+    
+    nodes.set_facecolor(node_colors)
+    nodes.set_sizes(node_sizes)
+    edges.set_color(edge_colors)
+    edges.set_linewidth(edge_widths)
+    ax.set_title(f"Simulation Time: Slot {current_slot}", fontsize=14, loc='left')
+    return True
+
+def draw_network_frame(G, pos, active_congestion, current_slot, ax=None):
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(10, 8))
+    else:
+        fig = ax.figure
+
+    _draw_network(G, pos, network_frame_styles(G, active_congestion), current_slot, ax)
+    
     return fig
 
 # --- ANIMATION CONTROLLER (from animate.py) ---
@@ -425,47 +512,88 @@ def render_simulation_ui(G, pos, congestion_state):
             st.info(f"Single time slot detected: {min_slot}")
             start_slot, end_slot = min_slot, max_slot
 
-    plot_placeholder = st.empty()
+    # Playback state survives reruns; Play/Stop trigger a full rerun that starts or ends it
+    if run_sim:
+        st.session_state['sim_playing'] = True
+        st.session_state['sim_frame'] = 0
+    if stop_sim:
+        st.session_state['sim_playing'] = False
     
     fig, ax = plt.subplots(figsize=(10, 6))
     
-    # Draw Initial Frame
-    if start_slot in congestion_state.index:
-        init_state = congestion_state.loc[start_slot].to_dict()
-    else:
-        init_state = {}
+    if not st.session_state.get('sim_playing', False):
+        # Draw Initial Frame (a slot without data draws all-healthy)
+        # Same array path as the animation: one row of the level matrix, no per-cell dict
+        init_styles = precompute_frame_styles(G, congestion_state, [start_slot])
+        _draw_network(G, pos, tuple(style[0] for style in init_styles), start_slot, ax)
+        st.pyplot(fig)
         
-    draw_network_frame(G, pos, init_state, start_slot, ax=ax)
-    plot_placeholder.pyplot(fig)
+        if st.session_state.pop('sim_complete', False):
+            st.success("Simulation Complete")
+        return
     
-    if run_sim:
-        for slot in range(start_slot, end_slot + 1):
-            if stop_sim:
-                break
-            
-            if slot in congestion_state.index:
-                current_state = congestion_state.loc[slot].to_dict()
-            else:
-                current_state = {}
-                
-            draw_network_frame(G, pos, current_state, slot, ax=ax)
-            plot_placeholder.pyplot(fig)
+    # Every frame's styling up front, so each frame only indexes arrays
+    slots = range(start_slot, end_slot + 1)
+    frame_styles = precompute_frame_styles(G, congestion_state, slots)
+    artists = [None]
+    
+    def draw_frame(f, target):
+        slot = slots[f]
+        styles = tuple(style[f] for style in frame_styles)
+        if artists[0] is None or not update_network_frame(artists[0], styles, slot, ax):
+            artists[0] = _draw_network(G, pos, styles, slot, ax)
+        target.pyplot(fig)
+    
+    if not hasattr(st, "fragment"):
+        # Streamlit < 1.37 has no auto-rerunning fragment: play the window in one blocking loop
+        plot_placeholder = st.empty()
+        for f in range(len(slots)):
+            draw_frame(f, plot_placeholder)
             time.sleep(speed)
-            
+        st.session_state['sim_playing'] = False
         st.success("Simulation Complete")
+        return
+    
+    # Only this fragment re-executes per frame; the rest of the page stays interactive
+    @st.fragment(run_every=speed)
+    def simulation_frame():
+        f = st.session_state.get('sim_frame', 0)
+        if f >= len(slots):
+            st.session_state['sim_playing'] = False
+            st.session_state['sim_complete'] = True
+            st.rerun()
+        
+        draw_frame(f, st)
+        st.session_state['sim_frame'] = f + 1
+    
+    simulation_frame()
 
-def prepare_congestion_data(df):
+def _level_matrix(values, bins, right, like):
+    """
+    Buckets a pivot into int8 levels (np.digitize: one compare-and-write pass, no masks),
+    labelled like the throughput pivot; slots/cells missing from values count as 0.
+    """
+    if not (values.index.equals(like.index) and values.columns.equals(like.columns)):
+        values = values.reindex(index=like.index, columns=like.columns, fill_value=0)
+    levels = np.digitize(values.to_numpy(copy=False), bins, right=right).astype(np.int8)
+    return pd.DataFrame(levels, index=like.index, columns=like.columns)
+
+def prepare_congestion_data(df, bits_to_gbps=None):
     """
     Converts raw dataframe to congestion state matrix (0, 1, 2).
+    Levels are stored as int8: the matrix is slots x cells and only ever holds 0-2.
+    bits_to_gbps: if given, throughput comes from df['bits'] scaled after the pivot,
+    so the caller needs no per-row 'gbps' column.
     """
     # 1. Pivot: Index=Slot, Col=Cell, Val=Gbps
-    pivot = df.pivot_table(index='slot_idx', columns='cell_id', values='gbps', fill_value=0)
+    if bits_to_gbps is None:
+        pivot = df.pivot_table(index='slot_idx', columns='cell_id', values='gbps', fill_value=0)
+    else:
+        pivot = df.pivot_table(index='slot_idx', columns='cell_id', values='bits', fill_value=0) * bits_to_gbps
     
     # Check if we have packet loss data
     has_loss_data = 'packet_loss' in df.columns and df['packet_loss'].max() > 0
     
-    congestion = pivot.copy()
-    
     # Check if we have systematic congestion score
     if 'congestion_score' in df.columns and df['congestion_score'].max() > 0:
         score_pivot = df.pivot_table(index='slot_idx', columns='cell_id', values='congestion_score', fill_value=0)
@@ -474,10 +602,7 @@ def prepare_congestion_data(df):
         # Score < 0.02 → Healthy (0)
         # 0.02 - 0.05 → Moderate (1)
         # > 0.05 → Heavy/Critical (2)
-        
-        congestion[:] = 0
-        congestion[score_pivot > 0.02] = 1
-        congestion[score_pivot > 0.05] = 2
+        return _level_matrix(score_pivot, [0.02, 0.05], True, pivot)
         
     elif has_loss_data:
         # Pivot loss data directly
@@ -486,14 +611,9 @@ def prepare_congestion_data(df):
         # Level 0: No Loss
         # Level 1: Low Loss (1-4 packets)
         # Level 2: High Loss (>4 packets)
-        congestion[:] = 0
-        congestion[loss_pivot > 0] = 1
-        congestion[loss_pivot > 4] = 2
-    else:
-        # Fallback to throughput inference if no packet data
-        # Assume 2.5 Gbps is "High" for a single cell (simplification)
-        congestion[pivot < 1.0] = 0
-        congestion[(pivot >= 1.0) & (pivot < 2.0)] = 1
-        congestion[pivot >= 2.0] = 2
+        return _level_matrix(loss_pivot, [0, 4], True, pivot)
     
-    return congestion.astype(int)
+    # Fallback to throughput inference if no packet data
+    # Assume 2.5 Gbps is "High" for a single cell (simplification)
+    # (< 1.0 → 0, 1.0 - 2.0 → 1, >= 2.0 → 2)
+    return _level_matrix(pivot, [1.0, 2.0], False, pivot)
@@ -0,0 +1,195 @@
+
+import json
+import os
+import shutil
+import pandas as pd
+
+# PyArrow is optional (see requirements.txt); pandas' whitespace parser is the fallback
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# orjson is optional as well; the stdlib json module is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _dedup_header(names):
+    """Renames repeated header fields the way pandas' C parser does: a, a -> a, a.1."""
+    counts = {}
+    deduped = list(names)
+    for i, original in enumerate(names):
+        name = original
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[original] = count + 1
+            name = f"{original}.{count}"
+            count = count + 1 if name in names else counts.get(name, 0)
+        deduped[i] = name
+        counts[name] = count + 1
+    return deduped
+
+def _read_dat_arrow(file_obj, names):
+    """
+    Arrow fast path for whitespace-separated telemetry (returns a Table).
+    Repeated or leading separators show up as all-null columns and are dropped;
+    any other irregularity returns None so the caller can fall back to pandas.
+    names=None takes the column names from the first row.
+    """
+    start = file_obj.tell()
+    delimiter = '\t' if b'\t' in file_obj.readline() else ' '
+    file_obj.seek(start)
+
+    table = pacsv.read_csv(
+        file_obj,
+        read_options=pacsv.ReadOptions(autogenerate_column_names=names is not None, block_size=1 << 20),
+        parse_options=pacsv.ParseOptions(delimiter=delimiter)
+    )
+
+    if table.num_rows == 0:
+        return None
+    kept = [i for i, col in enumerate(table.columns) if col.null_count < len(col)]
+    if names is None:
+        names = [table.column_names[i] for i in kept]
+        # Blank header fields ("Unnamed: i" in pandas) are rare enough to leave to pandas
+        if '' in names:
+            return None
+        names = _dedup_header(names)
+    columns = [table.column(i) for i in kept]
+    if len(columns) != len(names) or any(col.null_count for col in columns):
+        return None
+
+    return pa.table(columns, names=names)
+
+def read_dat_table(file_obj, names=None):
+    """
+    Arrow Table of a whitespace-separated .dat file (binary file object), for callers that
+    concatenate many files before converting. None if Arrow is missing or the file needs
+    pandas' parser; the file position is then left where it was.
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    start = file_obj.tell()
+    try:
+        table = _read_dat_arrow(file_obj, names)
+    except pa.ArrowInvalid:
+        table = None
+    if table is None:
+        file_obj.seek(start)
+    return table
+
+def read_dat(file_obj, names=None):
+    """
+    Reads a whitespace-separated .dat file (binary file object) into a DataFrame.
+    Equivalent to pd.read_csv(sep=r'\\s+', names=names) but parsed by Arrow when possible;
+    without names the first row is the header, as in pandas.
+    """
+    table = read_dat_table(file_obj, names)
+    if table is not None:
+        return table.to_pandas(self_destruct=True)
+
+    return pd.read_csv(file_obj, sep=r'\s+', names=names, engine='c')
+
+def frame_to_ipc(df):
+    """
+    Serializes a DataFrame to Arrow IPC stream bytes (None if Arrow can't represent it).
+    Reading the stream back is far cheaper than re-parsing the source files.
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    try:
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns (e.g. labels zero-filled after an outer merge)
+        return None
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def frame_from_ipc(blob):
+    """Inverse of frame_to_ipc: a fresh DataFrame on every call."""
+    with pa.ipc.open_stream(blob) as reader:
+        return reader.read_all().to_pandas()
+
+def frame_to_parquet(df, path):
+    """
+    Writes a DataFrame to a Snappy-compressed Parquet file.
+    Returns False (writing nothing) if Arrow is missing or can't represent the frame.
+    """
+    if not PYARROW_AVAILABLE:
+        return False
+    try:
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return False
+    # Write then rename, so a concurrent reader never sees a partial file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, temp_path, compression='snappy')
+    os.replace(temp_path, path)
+    return True
+
+def frames_to_parquet_dataset(partitions, root, partition_col):
+    """
+    Writes (value, DataFrame) pairs as a hive-partitioned Parquet dataset
+    (root/partition_col=value/part-0.parquet, Snappy), one partition at a time, so only the
+    current frame needs to be in memory. Readers can then load a single partition with
+    filters=[(partition_col, '=', value)].
+    The dataset replaces root as a whole once complete. Returns False (writing nothing)
+    if Arrow is missing or can't represent a frame.
+    """
+    if not PYARROW_AVAILABLE:
+        return False
+    temp_root = f"{root}.{os.getpid()}.tmp"
+    try:
+        for value, frame in partitions:
+            part_dir = os.path.join(temp_root, f"{partition_col}={value}")
+            os.makedirs(part_dir, exist_ok=True)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            pq.write_table(table, os.path.join(part_dir, "part-0.parquet"), compression='snappy')
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        shutil.rmtree(temp_root, ignore_errors=True)
+        return False
+
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    elif os.path.exists(root):
+        os.remove(root)
+    os.replace(temp_root, root)
+    return True
+
+def frame_from_parquet(path):
+    """Reads a frame written by frame_to_parquet (memory-mapped)."""
+    return pq.read_table(path, memory_map=True).to_pandas()
+
+def frame_to_parquet_bytes(df, metadata=None):
+    """
+    Zstd-compressed Parquet file contents for a download (None if Arrow is missing or
+    can't represent the frame). metadata: extra bytes key/values for the file schema.
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression='zstd')
+    return sink.getvalue().to_pybytes()
+
+def dumps_json(payload):
+    """
+    Serializes payload to 2-space indented JSON as UTF-8 bytes.
+    Uses orjson (C, NumPy-aware) when installed; otherwise json.dumps(indent=2).
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, indent=2).encode('utf-8')
@@ -1,10 +1,11 @@
 
 import pandas as pd
 import numpy as np
-import random
 import time
 import streamlit as st
 
+from capacity_kernels import link_peak_bits
+
 # Cost Table (same as app.py)
 # CAPEX Cost Estimates (INR per link - Typical Operator Pricing in India)
 # Approx conversion ~85 INR/USD + taxes
@@ -17,92 +18,184 @@ DEFAULT_LINK_COSTS = {
     100: 2975000
 }
 LINK_SPEEDS = [1, 10, 25, 40, 100]
+# 80% utilization rule: the usable capacity of each speed, ascending
+SPEED_THRESHOLDS = np.array(LINK_SPEEDS, dtype=np.float64) * 0.8
+SPEED_VALUES = np.array(LINK_SPEEDS, dtype=np.int32)
+
+def _speed_indices(gbps_vals):
+    """Position in LINK_SPEEDS of the speed each value needs (branchless, any array shape)."""
+    # side='left': a value exactly at 80% of a speed still fits it (gbps <= speed * 0.8)
+    idx = np.searchsorted(SPEED_THRESHOLDS, np.asarray(gbps_vals, dtype=np.float64), side='left')
+    return np.minimum(idx, len(LINK_SPEEDS) - 1)
+
+def get_required_speed_vec(gbps_vals):
+    """
+    Smallest speed whose 80% utilization covers each value (100G beyond the ladder),
+    as an int32 array shaped like gbps_vals. One np.searchsorted over SPEED_THRESHOLDS.
+    """
+    return SPEED_VALUES[_speed_indices(gbps_vals)]
+
+def cost_vec(gbps_vals, link_costs=None):
+    """CAPEX of the link speed each value needs (link_costs: speed -> cost, default DEFAULT_LINK_COSTS)."""
+    if link_costs is None:
+        link_costs = DEFAULT_LINK_COSTS
+    return np.array([link_costs[s] for s in LINK_SPEEDS])[_speed_indices(gbps_vals)]
+
+def get_required_speeds(gbps_vals):
+    """get_required_speed_vec as a list of Python ints."""
+    return np.atleast_1d(get_required_speed_vec(gbps_vals)).tolist()
 
 def get_required_speed(gbps_val):
-    for speed in LINK_SPEEDS:
-        if gbps_val <= speed * 0.8:  # 80% utilization rule
-            return speed
-    return 100
+    return get_required_speeds([gbps_val])[0]
+
+def cell_slot_matrix(df):
+    """
+    Per-cell traffic as a dense (cells x slots) matrix of summed bits.
+    Built once per frame; any cell-to-link mapping is then scored with NumPy sums.
+    Returns (cell_index, matrix, has_data) where cell_index maps cell_id -> row.
+    """
+    cell_codes, cells = pd.factorize(df['cell_id'])
+    slots = df['slot_idx'].to_numpy()
+    slot_offsets = slots - slots.min() if len(slots) else slots
+    n_slots = int(slot_offsets.max()) + 1 if len(slots) else 0
+    
+    flat = cell_codes.astype(np.int64) * n_slots + slot_offsets
+    size = len(cells) * n_slots
+    matrix = np.bincount(flat, weights=df['bits'].to_numpy(dtype=np.float64), minlength=size)
+    # Slots where a cell actually logged traffic (empty slots must not count as 0-bit samples)
+    has_data = np.bincount(flat, minlength=size) > 0
+    
+    cell_index = {cell: i for i, cell in enumerate(cells)}
+    return cell_index, matrix.reshape(len(cells), n_slots), has_data.reshape(len(cells), n_slots)
 
-    return 100
+def prepare_topology_frame(df, slot_duration=0.0005):
+    """
+    The columns the optimizer reads, typed once: cell_id as int32 codes in order of first
+    appearance, slot_idx as int32 (derived from 'time' when missing), bits as float64.
+    Returns (frame, cells) where cells[code] is the original cell ID.
+    """
+    codes, cells = pd.factorize(df['cell_id'])
+    if 'slot_idx' in df.columns:
+        slots = df['slot_idx'].to_numpy()
+    else:
+        slots = ((df['time'] - df['time'].min()) / slot_duration).astype(int).to_numpy()
+    
+    frame = pd.DataFrame({
+        'cell_id': codes.astype(np.int32),
+        'slot_idx': slots.astype(np.int32),
+        'bits': df['bits'].to_numpy(dtype=np.float64),
+    })
+    return frame, cells
 
-def calculate_topology_cost(df, mapping, slot_duration=0.0005, gbps_scale=1e9, link_costs=None):
+def calculate_topology_cost(df, mapping, slot_duration=0.0005, gbps_scale=1e9, link_costs=None, cell_matrix=None):
     """
     Calculates the total CAPEX for a given cell-to-link mapping.
+    Pass cell_matrix=cell_slot_matrix(df) to reuse the per-cell aggregation across mappings.
+    """
+    if cell_matrix is None:
+        cell_matrix = cell_slot_matrix(df)
+    cell_index, matrix, has_data = cell_matrix
+    
+    # Mapping as an int32 link number per matrix row (-1: cell not in the mapping)
+    link_ids = list(dict.fromkeys(mapping.values()))
+    link_num = {link_id: i for i, link_id in enumerate(link_ids)}
+    link_of_cell = np.full(len(cell_index), -1, dtype=np.int32)
+    for cell, link_id in mapping.items():
+        if cell in cell_index:
+            link_of_cell[cell_index[cell]] = link_num[link_id]
+    
+    return assignment_cost(cell_matrix, link_of_cell, link_ids, slot_duration, gbps_scale, link_costs)
+
+def assignment_cost(cell_matrix, link_of_cell, link_ids, slot_duration=0.0005, gbps_scale=1e9, link_costs=None):
+    """
+    calculate_topology_cost for a mapping already given as an int32 link number per
+    cell_matrix row (index into link_ids, -1 = unassigned). No DataFrame or dict work,
+    so the optimizer can score each candidate straight from the matrix.
     """
-    # Map cells to links
-    df_copy = df.copy()
-    df_copy['link_id'] = df_copy['cell_id'].map(mapping)
+    _, matrix, has_data = cell_matrix
+    peak_bits = link_peak_bits(matrix, has_data, link_of_cell, len(link_ids))
     
-    # 2. Aggregate traffic per link
-    # groupby link and time, sum bits
-    link_traffic = df_copy.groupby(['link_id', 'slot_idx'])['bits'].sum().reset_index()
+    # Max Gbps and required speed for every link in one batch
+    peaks_gbps = (peak_bits / slot_duration) / gbps_scale
+    req_speeds = get_required_speeds(peaks_gbps)
+    if link_costs is None:
+        link_costs = DEFAULT_LINK_COSTS
     
-    # 3. Calculate max Gbps for each link
     total_cost = 0
     link_details = {}
     
-    for link_id in mapping.values():
-        if link_id not in link_details: # Process each link once
-            # Get data for this link
-            l_data = link_traffic[link_traffic['link_id'] == link_id]
-            if l_data.empty:
-                peak_gbps = 0
-            else:
-                max_bits = l_data['bits'].max()
-                peak_gbps = (max_bits / slot_duration) / gbps_scale
-            
-            req_speed = get_required_speed(peak_gbps)
-            if link_costs is None:
-                link_costs = DEFAULT_LINK_COSTS
-                
-            cost = link_costs[req_speed]
-            total_cost += cost
-            link_details[link_id] = {'peak': peak_gbps, 'speed': req_speed, 'cost': cost}
+    for link_id, peak_gbps, req_speed in zip(link_ids, peaks_gbps.tolist(), req_speeds):
+        cost = link_costs[req_speed]
+        total_cost += cost
+        link_details[link_id] = {'peak': peak_gbps, 'speed': req_speed, 'cost': cost}
             
     return total_cost, link_details
 
-def optimize_topology(df, num_links=3, iterations=200, link_costs=None):
+def batch_assignment_costs(cell_matrix, assign, n_links, slot_duration=0.0005, gbps_scale=1e9, link_costs=None):
+    """
+    Total CAPEX of many candidates at once: assign is (candidates x cells) int32 link numbers
+    per cell_matrix row. Every (candidate, link) membership row goes through one matrix
+    product with the cells x slots bits, so the whole batch is a few NumPy kernels.
+    """
+    _, matrix, _ = cell_matrix
+    n_candidates, n_cells = assign.shape
+    membership = (assign[:, None, :] == np.arange(n_links, dtype=np.int32)[None, :, None])
+    membership = membership.reshape(n_candidates * n_links, n_cells).astype(np.float64)
+    
+    # Bits are non-negative, so the max over all slots equals link_peak_bits' max over
+    # slots with traffic (0 for a link without any). Chunked to keep each product ~32 MB.
+    peak_bits = np.empty(len(membership), dtype=np.float64)
+    step = max(1, (1 << 22) // max(matrix.shape[1], 1))
+    for start in range(0, len(membership), step):
+        peak_bits[start:start + step] = (membership[start:start + step] @ matrix).max(axis=1, initial=0.0)
+    
+    peaks_gbps = (peak_bits / slot_duration) / gbps_scale
+    return cost_vec(peaks_gbps, link_costs).reshape(n_candidates, n_links).sum(axis=1)
+
+def optimize_topology(df, num_links=3, iterations=200, link_costs=None, seed=None):
     """
     Tries random permutations to find a topology with lower Total CAPEX.
     Maximizes statistical multiplexing by grouping non-overlapping peaks.
+    seed: makes the search reproducible (None draws fresh entropy).
     """
-    unique_cells = df['cell_id'].unique().tolist()
-    
     best_mapping = {}
     best_cost = float('inf')
     best_details = {}
     
-    # Ensure slot_idx exists
+    # Typed columns once, up front (the caller's df is never modified or copied)
     slot_duration = 0.0005
-    if 'slot_idx' not in df.columns:
-        min_time = df['time'].min()
-        df['slot_idx'] = ((df['time'] - min_time) / slot_duration).astype(int)
+    frame, cells = prepare_topology_frame(df, slot_duration)
+    unique_cells = cells.tolist()
         
     start_time = time.time()
     
-    # Try random assignments
-    for i in range(iterations):
-        # Shuffle cells
-        random.shuffle(unique_cells)
-        
-        # Split into roughly equal groups
-        # (This is a simplification, we could also vary group sizes, but let's assume balanced load is generally good)
-        chunk_size = -(-len(unique_cells) // num_links) # Ceiling division
-        
-        current_mapping = {}
-        for idx, cell in enumerate(unique_cells):
-            link_num = (idx // chunk_size) + 1
-            # Ensure we don't exceed num_links (for uneven splits)
-            if link_num > num_links: link_num = num_links
-            current_mapping[cell] = f"Link_{link_num}"
-            
-        # Calculate Cost
-        cost, details = calculate_topology_cost(df, current_mapping, link_costs=link_costs)
-        
-        if cost < best_cost:
-            best_cost = cost
-            best_mapping = current_mapping.copy()
-            best_details = details
+    # Per-cell aggregation is mapping-independent: build it once for all iterations
+    # (row i is cell code i, i.e. unique_cells[i])
+    cell_matrix = cell_slot_matrix(frame)
+    
+    # Split into roughly equal groups
+    # (This is a simplification, we could also vary group sizes, but let's assume balanced load is generally good)
+    chunk_size = -(-len(unique_cells) // num_links) # Ceiling division
+    # Link number of each shuffled position; ensure we don't exceed num_links (for uneven splits)
+    position_link = np.minimum(np.arange(len(unique_cells)) // chunk_size, num_links - 1).astype(np.int32)
+    link_ids = [f"Link_{k + 1}" for k in range(int(position_link.max()) + 1)] if len(unique_cells) else []
+    
+    if iterations <= 0:
+        return best_mapping, best_cost, best_details
+    
+    # Try random assignments: all candidate shuffles at once, one permutation of matrix rows
+    # per iteration, then scatter the position -> link vector through each of them
+    rng = np.random.default_rng(seed)
+    order = rng.random((iterations, len(unique_cells))).argsort(axis=1)
+    assign = np.empty(order.shape, dtype=np.int32)
+    np.put_along_axis(assign, order, position_link[None, :], axis=1)
+    
+    # Calculate Cost of every candidate; the first cheapest wins, as with a running minimum
+    costs = batch_assignment_costs(cell_matrix, assign, len(link_ids), slot_duration, link_costs=link_costs)
+    best = int(np.argmin(costs))
+    best_cost, best_details = assignment_cost(cell_matrix, assign[best], link_ids, slot_duration, link_costs=link_costs)
+    
+    # Only the winner becomes a cell -> link dict
+    best_mapping = {unique_cells[r]: link_ids[k] for r, k in zip(order[best].tolist(), position_link.tolist())}
             
     return best_mapping, best_cost, best_details